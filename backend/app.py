@@ -2,19 +2,66 @@ from flask import Flask, jsonify, request, render_template
 from flask_cors import CORS, cross_origin
 import pandas as pd
 import numpy as np
-from collections import defaultdict
+from collections import defaultdict, Counter
+from concurrent.futures import ThreadPoolExecutor
+from itertools import combinations
 import json
 import dotenv
 import os
+import random
 import base64
+import threading
 import requests
+from requests.adapters import HTTPAdapter
+from cachetools import TTLCache
 from datetime import datetime, timedelta
 import uuid
 from pymongo import MongoClient
 
 dotenv.load_dotenv()
 
+# Optional fused distance kernel; falls back to the NumPy broadcast when
+# numba is not installed
+try:
+    from numba import njit, prange
+
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _sq_dist_to_centroid(feat, mu, out):
+        n, d = feat.shape
+        for i in prange(n):
+            s = np.float32(0.0)
+            for k in range(d):
+                diff = feat[i, k] - mu[k]
+                s += diff * diff
+            out[i] = s
+
+    # Warm up the JIT at import so the first request doesn't pay compile time
+    _sq_dist_to_centroid(np.zeros((1, 1), dtype=np.float32),
+                         np.zeros(1, dtype=np.float32),
+                         np.empty(1, dtype=np.float32))
+
+except ImportError:
+    _sq_dist_to_centroid = None
+
+# orjson serializes large record lists 3-10x faster than stdlib json; fall
+# back to Flask's jsonify when it isn't installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 app = Flask(__name__)
+app.json.sort_keys = False
+
+
+def ojsonify(obj):
+    """jsonify through orjson when available"""
+    if orjson is None:
+        return jsonify(obj)
+    return app.response_class(
+        orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY),
+        mimetype='application/json'
+    )
 
 CORS(app, resources={
     r"/*": {
@@ -39,6 +86,18 @@ def after_request(response):
 db = MongoClient(os.getenv("MONGO_URI"))["spotiswipe"]
 collection = db["users_data"]
 
+
+def _ensure_indexes():
+    """Index session lookups so the swipe/update path stays O(log N)"""
+    try:
+        collection.create_index("session_id", unique=True, background=True)
+    except Exception as e:
+        print(f"Error creating MongoDB index: {e}")
+
+
+# Best-effort and off the startup path so an unreachable Mongo can't block boot
+threading.Thread(target=_ensure_indexes, daemon=True).start()
+
 SPOTIFY_CLIENT_ID = os.getenv("SPOTIFY_CLIENT_ID")
 SPOTIFY_CLIENT_SECRET = os.getenv("SPOTIFY_CLIENT_SECRET")
 
@@ -46,6 +105,15 @@ SPOTIFY_CLIENT_SECRET = os.getenv("SPOTIFY_CLIENT_SECRET")
 # Global variables for token management
 global_access_token = None
 token_expiry = None
+token_lock = threading.Lock()
+
+# Shared HTTP session so Spotify calls reuse pooled TCP/TLS connections
+spotify_session = requests.Session()
+spotify_session.mount("https://", HTTPAdapter(pool_connections=20, pool_maxsize=50))
+
+# In-process cache of track details so repeated swipe cards skip the Spotify round trip
+track_detail_cache = TTLCache(maxsize=50_000, ttl=86400)
+track_detail_cache_lock = threading.Lock()
 
 
 
@@ -56,33 +124,39 @@ def get_access_token():
     # Check if current token is still valid
     if global_access_token and token_expiry and datetime.now() < token_expiry:
         return global_access_token
-    
-    try:
-        # Encode client credentials
-        auth_string = f"{SPOTIFY_CLIENT_ID}:{SPOTIFY_CLIENT_SECRET}"
-        auth_b64 = base64.b64encode(auth_string.encode()).decode()
-        
-        # Request new token
-        response = requests.post(
-            "https://accounts.spotify.com/api/token",
-            headers={
-                "Authorization": f"Basic {auth_b64}",
-                "Content-Type": "application/x-www-form-urlencoded"
-            },
-            data={"grant_type": "client_credentials"}
-        )
-        
-        response.raise_for_status()
-        token_data = response.json()
-        
-        # Update global token and expiry
-        global_access_token = token_data.get("access_token")
-        token_expiry = datetime.now() + timedelta(seconds=token_data.get("expires_in", 3600) - 300)  # Buffer of 5 minutes
-        
-        return global_access_token
-    
-    except Exception as e:
-        return None
+
+    # Double-checked locking: only one thread refreshes on concurrent expiry,
+    # the rest reuse its result instead of stampeding Spotify
+    with token_lock:
+        if global_access_token and token_expiry and datetime.now() < token_expiry:
+            return global_access_token
+
+        try:
+            # Encode client credentials
+            auth_string = f"{SPOTIFY_CLIENT_ID}:{SPOTIFY_CLIENT_SECRET}"
+            auth_b64 = base64.b64encode(auth_string.encode()).decode()
+
+            # Request new token
+            response = spotify_session.post(
+                "https://accounts.spotify.com/api/token",
+                headers={
+                    "Authorization": f"Basic {auth_b64}",
+                    "Content-Type": "application/x-www-form-urlencoded"
+                },
+                data={"grant_type": "client_credentials"}
+            )
+
+            response.raise_for_status()
+            token_data = response.json()
+
+            # Update global token and expiry
+            global_access_token = token_data.get("access_token")
+            token_expiry = datetime.now() + timedelta(seconds=token_data.get("expires_in", 3600) - 300)  # Buffer of 5 minutes
+
+            return global_access_token
+
+        except Exception as e:
+            return None
 
 def refresh_token_if_needed():
     """Check and refresh token if needed"""
@@ -94,132 +168,145 @@ def refresh_token_if_needed():
 
 
 class MusicRecommender:
+    # Weight of the normalized co-occurrence score relative to content similarity
+    COOC_WEIGHT = 0.1
+
     def __init__(self, data):
         """Initialize the recommender with cleaned data"""
         self.data = data
-        self.data['genre_list'] = self.data['track_genre'].str.split(',').apply(lambda x: [g.strip() for g in x])
-        self.unique_genres = set()
-        for genres in self.data['genre_list']:
-            self.unique_genres.update(genres)
-            
+        self.data['genre_list'] = self.data['track_genre'].str.split(r'\s*,\s*', regex=True)
+        self.unique_genres = set(self.data['genre_list'].explode().unique())
+
+
         self.feature_columns = [
             'danceability', 'energy', 'loudness', 'speechiness',
             'acousticness', 'instrumentalness', 'liveness', 
             'valence', 'tempo'
         ]
-        self.data_normalized = self._normalize_features()
-        
-        # Co-occurrence matrix for collaborative filtering
-        self.co_occurrence_matrix = {}
-    
-    def _normalize_features(self):
-        """Normalize all numerical features to 0-1 range"""
-        normalized_data = self.data.copy()
-        for column in self.feature_columns:
-            if column == 'loudness':
-                max_abs = max(abs(min(self.data[column])), abs(max(self.data[column])))
-                normalized_data[column] = self.data[column].apply(lambda x: (x + max_abs) / (2 * max_abs))
-            else:
-                min_val = min(self.data[column])
-                max_val = max(self.data[column])
-                if max_val - min_val > 0:
-                    normalized_data[column] = self.data[column].apply(lambda x: (x - min_val) / (max_val - min_val))
-                else:
-                    normalized_data[column] = self.data[column].apply(lambda x: 0)
-        return normalized_data
+        # Contiguous float32 matrix of normalized features for vectorized scoring
+        self.feature_matrix = self._build_feature_matrix()
+
+        # Squared row norms, cached for the ||x-mu||^2 expansion in scoring
+        self._row_sq = np.einsum('ij,ij->i', self.feature_matrix, self.feature_matrix)
+
+        # Row norms, cached for the cosine scoring path
+        self._row_norms = np.sqrt(self._row_sq)
+        self._row_norms[self._row_norms == 0] = 1.0
+
+        # Unit-length rows: cosine similarity becomes a single matvec with no
+        # per-query division across the catalog
+        self._feature_matrix_unit = (self.feature_matrix / self._row_norms[:, None]).astype(np.float32)
+
+        # O(1) track_id -> matrix row lookup
+        self.trackid_to_row = {tid: i for i, tid in enumerate(self.data['track_id'].values)}
+
+        # Inverted genre index: genre -> row positions, plus popularity-sorted variants
+        self.popularity = self.data['popularity'].to_numpy()
+        genre_to_rows = defaultdict(list)
+        for i, genres in enumerate(self.data['genre_list'].values):
+            for genre in genres:
+                genre_to_rows[genre].append(i)
+        self.genre_to_rows = {g: np.asarray(rows) for g, rows in genre_to_rows.items()}
+        # Head arrays are capped: initial decks never need more than the top
+        # tracks of a genre, and the cap bounds memory on large catalogs
+        self.genre_top_rows = {g: rows[np.argsort(-self.popularity[rows])][:1000]
+                               for g, rows in self.genre_to_rows.items()}
+
+        # Prebuilt response dicts so hot paths skip per-request to_dict munging
+        self.records = self.data.to_dict('records')
+        for rec in self.records:
+            rec['index'] = rec['track_id']
+            rec['track_genre'] = ', '.join(rec['genre_list'])
+            del rec['genre_list']
 
-    def _calculate_average_features(self, indices):
-        """Calculate average features for a list of song indices"""
-        if not indices:
-            return {col: 0 for col in self.feature_columns}
-        
-        sums = {col: 0 for col in self.feature_columns}
-        count = len(indices)
-        
-        for idx in indices:
-            for col in self.feature_columns:
-                sums[col] += self.data_normalized.loc[idx][col]
-        
-        return {col: sums[col] / count for col in self.feature_columns}
+        # Co-occurrence matrix for collaborative filtering
+        self.co_occurrence_matrix = defaultdict(Counter)
     
-    def _calculate_cosine_similarity(self, features1, features2):
-        """Calculate Cosine similarity between two feature vectors"""
-        dot_product = sum(f1 * f2 for f1, f2 in zip(features1, features2))
-        magnitude1 = sum(f1 ** 2 for f1 in features1) ** 0.5
-        magnitude2 = sum(f2 ** 2 for f2 in features2) ** 0.5
-        if magnitude1 * magnitude2 == 0:
-            return 0
-        return dot_product / (magnitude1 * magnitude2)
+    def _build_feature_matrix(self):
+        """Build the min-max normalized float32 feature matrix"""
+        raw = self.data[self.feature_columns].to_numpy(dtype=np.float32)
+        mins = raw.min(axis=0)
+        maxs = raw.max(axis=0)
+        ranges = np.where(maxs > mins, maxs - mins, 1.0).astype(np.float32)
+        normalized = (raw - mins) / ranges
+
+        # Loudness is negative-valued, so scale it symmetrically around zero
+        loudness = self.feature_columns.index('loudness')
+        max_abs = max(abs(mins[loudness]), abs(maxs[loudness]))
+        if max_abs > 0:
+            normalized[:, loudness] = (raw[:, loudness] + max_abs) / (2 * max_abs)
+
+        return np.ascontiguousarray(normalized)
 
     def _update_co_occurrence_matrix(self, liked_songs_indices):
         """Update co-occurrence matrix based on liked songs"""
-        for i, song1 in enumerate(liked_songs_indices):
-            if song1 not in self.co_occurrence_matrix:
-                self.co_occurrence_matrix[song1] = {}
-            for j, song2 in enumerate(liked_songs_indices):
-                if i != j:
-                    if song2 not in self.co_occurrence_matrix[song1]:
-                        self.co_occurrence_matrix[song1][song2] = 0
-                    self.co_occurrence_matrix[song1][song2] += 1
+        for song1, song2 in combinations(liked_songs_indices, 2):
+            self.co_occurrence_matrix[song1][song2] += 1
+            self.co_occurrence_matrix[song2][song1] += 1
 
     def generate_recommendations(self, liked_songs_indices, n_recommendations=25, use_cosine_similarity=True):
         """Generate recommendations based on liked songs using hybrid recommendation approach"""
         try:
             if not liked_songs_indices:
                 return []
-            
-            # Update the co-occurrence matrix
-            self._update_co_occurrence_matrix(liked_songs_indices)
-            
-            # Convert track_ids to dataframe indices
-            liked_indices = []
-            for track_id in liked_songs_indices:
-                try:
-                    song_idx = self.data[self.data['track_id'] == track_id].index[0]
-                    liked_indices.append(song_idx)
-                except (IndexError, KeyError):
-                    continue
-            
-            if not liked_indices:
+
+            # Map liked track_ids to matrix rows (O(1) hash lookup each)
+            liked_rows = [self.trackid_to_row[tid] for tid in liked_songs_indices
+                          if tid in self.trackid_to_row]
+
+            if not liked_rows:
                 return []
-            
-            # Calculate average features of liked songs
-            avg_features = self._calculate_average_features(liked_indices)
-            
-            # Calculate similarities for all songs
-            similarities = []
-            for idx in self.data_normalized.index:
-                if idx not in liked_indices:
-                    current_features = [self.data_normalized.loc[idx][col] for col in self.feature_columns]
-                    avg_features_list = [avg_features[col] for col in self.feature_columns]
-                    
-                    if use_cosine_similarity:
-                        similarity = self._calculate_cosine_similarity(current_features, avg_features_list)
-                    else:
-                        distance = self._calculate_euclidean_distance(current_features, avg_features_list)
-                        similarity = 1 / (1 + distance)
-                    
-                    similarities.append((idx, similarity))
-            
-            # Sort by similarity and get top recommendations
-            similarities.sort(key=lambda x: x[1], reverse=True)
-            recommended_indices = [idx for idx, _ in similarities[:n_recommendations]]
-            
-            # Include collaborative recommendations from co-occurrence matrix
-            for liked_idx in liked_indices:
-                if liked_idx in self.co_occurrence_matrix:
-                    for co_idx, freq in sorted(self.co_occurrence_matrix[liked_idx].items(), key=lambda x: x[1], reverse=True):
-                        if co_idx not in recommended_indices and len(recommended_indices) < n_recommendations:
-                            recommended_indices.append(co_idx)
-            
-            recommendations = self.data.loc[recommended_indices].to_dict('records')
-            
-            for rec in recommendations:
-                rec['index'] = rec['track_id']
-                rec['track_genre'] = ', '.join(rec['genre_list'])
-                del rec['genre_list']
-            
-            return recommendations
+
+            # Update the co-occurrence matrix
+            self._update_co_occurrence_matrix(liked_rows)
+
+            # Calculate average features of liked songs (kept float32 so the
+            # distance kernel never upcasts to float64)
+            liked_mean = self.feature_matrix[liked_rows].mean(axis=0, dtype=np.float32)
+
+            # Score every track against the liked-songs centroid in one broadcast
+            if use_cosine_similarity:
+                q_norm = np.linalg.norm(liked_mean)
+                query = liked_mean / q_norm if q_norm > 0 else liked_mean
+                similarities = self._feature_matrix_unit @ query
+            else:
+                # 1/(1+||x-mu||) is monotone in the squared distance, so rank on
+                # the negated squared distance and skip the sqrt entirely
+                if _sq_dist_to_centroid is not None:
+                    sq_dists = np.empty(len(self.feature_matrix), dtype=np.float32)
+                    _sq_dist_to_centroid(self.feature_matrix, liked_mean, sq_dists)
+                    similarities = -sq_dists
+                else:
+                    # ||x-mu||^2 = ||x||^2 - 2 x.mu + ||mu||^2: one BLAS matvec
+                    # against cached row norms, no (N, 9) difference temporary
+                    similarities = (2.0 * (self.feature_matrix @ liked_mean)
+                                    - self._row_sq - liked_mean @ liked_mean)
+
+            # Blend in the collaborative signal: accumulate co-occurrence
+            # counts across the liked songs into one score vector and add it
+            # to the content score (normalized so it acts as a tiebreak boost)
+            cooc_scores = np.zeros(len(similarities), dtype=np.float32)
+            for liked_row in liked_rows:
+                counts = self.co_occurrence_matrix.get(liked_row)
+                if counts:
+                    rows = np.fromiter(counts.keys(), dtype=np.intp, count=len(counts))
+                    cooc_scores[rows] += np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+
+            max_cooc = cooc_scores.max()
+            if max_cooc > 0:
+                similarities = similarities + self.COOC_WEIGHT * (cooc_scores / max_cooc)
+
+            # Exclude already-liked songs with a boolean mask
+            liked_mask = np.zeros(len(similarities), dtype=bool)
+            liked_mask[liked_rows] = True
+            similarities[liked_mask] = -np.inf
+
+            # Partition out the top-N then sort only those (O(N + k log k) vs O(N log N))
+            k = min(n_recommendations, len(similarities))
+            top_rows = np.argpartition(-similarities, k - 1)[:k]
+            recommended_rows = top_rows[np.argsort(-similarities[top_rows])].tolist()
+
+            return [self.records[row] for row in recommended_rows]
             
         except Exception as e:
             print(f"Error in generate_recommendations: {e}")
@@ -228,27 +315,20 @@ class MusicRecommender:
     def get_initial_songs(self, selected_genres, n_songs=20):
         """Get initial songs that match any of the selected genres with random shuffling"""
         try:
-            # Filter songs by selected genres
-            genre_songs = []
-            for idx, row in self.data.iterrows():
-                if any(genre in row['genre_list'] for genre in selected_genres):
-                    song_dict = row.to_dict()
-                    song_dict['index'] = song_dict['track_id']
-                    song_dict['track_genre'] = ', '.join(song_dict['genre_list'])
-                    del song_dict['genre_list']
-                    genre_songs.append((song_dict, song_dict['popularity']))
-            
-            if not genre_songs:
+            # Union of the precomputed per-genre rows, most popular tracks first
+            candidate_rows = set()
+            for genre in selected_genres:
+                if genre in self.genre_top_rows:
+                    candidate_rows.update(self.genre_top_rows[genre][:n_songs].tolist())
+
+            if not candidate_rows:
                 return []
-            
-            # Shuffle all genre songs
-            import random
-            random.shuffle(genre_songs)
-            
-            # Trim to the top n_songs
-            selected_songs = [song[0] for song in genre_songs[:n_songs]]
-            
-            return selected_songs
+
+            # Shuffle the candidate pool and trim to n_songs
+            candidate_rows = list(candidate_rows)
+            random.shuffle(candidate_rows)
+
+            return [self.records[row] for row in candidate_rows[:n_songs]]
 
         except Exception as e:
             print(f"Error in get_initial_songs: {e}")
@@ -257,61 +337,113 @@ class MusicRecommender:
         
     def get_song_data(self, track_id):
         """Get song data by track_id"""
-        try:
-            song = self.data[self.data['track_id'] == track_id].iloc[0].to_dict()
-            song['track_genre'] = ', '.join(song['genre_list'])
-            del song['genre_list']
-            return song
-        except:
+        row = self.trackid_to_row.get(track_id)
+        if row is None:
             return None
+        return self.records[row]
 
 # Update data loading and cleaning
+CATALOG_CSV = 'spotify_tracks_data.csv'
+CATALOG_CACHE = 'catalog_cache.pkl'
+
 try:
-    df = pd.read_csv('spotify_tracks_data.csv')
-    
-    # Clean the data
-    df = df.dropna()
-    df = df.drop_duplicates(subset='track_id')
-    
-    # drop row with "Unknown" genre
-    df = df[df['track_genre'] != 'Unknown']
-    
-    # Split genres into lists
-    df['track_genre'] = df['track_genre'].str.strip()
-    
-    # Ensure all required columns exist and have valid data
-    required_columns = [
-        'track_id', 'track_name', 'artists', 'track_genre',
-        'popularity', 'danceability', 'energy', 'loudness',
-        'speechiness', 'acousticness', 'instrumentalness',
-        'liveness', 'valence', 'tempo'
-    ]
-    
-    for col in required_columns:
-        if col not in df.columns:
-            raise ValueError(f"Missing required column: {col}")
-    
-    # Convert numerical columns to appropriate types
-    numerical_columns = [
-        'popularity', 'danceability', 'energy', 'loudness',
-        'speechiness', 'acousticness', 'instrumentalness',
-        'liveness', 'valence', 'tempo'
-    ]
-    
-    for col in numerical_columns:
-        df[col] = pd.to_numeric(df[col], errors='coerce')
-    
-    # Drop any rows with invalid numerical values
-    df = df.dropna()
-    
+    if (os.path.exists(CATALOG_CACHE)
+            and os.path.getmtime(CATALOG_CACHE) >= os.path.getmtime(CATALOG_CSV)):
+        # Cleaned catalog from a previous boot: skips CSV parse and cleaning
+        df = pd.read_pickle(CATALOG_CACHE)
+    else:
+        df = pd.read_csv(CATALOG_CSV)
+
+        # Clean the data
+        df = df.dropna()
+        df = df.drop_duplicates(subset='track_id')
+
+        # drop row with "Unknown" genre
+        df = df[df['track_genre'] != 'Unknown']
+
+        # Split genres into lists
+        df['track_genre'] = df['track_genre'].str.strip()
+
+        # Ensure all required columns exist and have valid data
+        required_columns = [
+            'track_id', 'track_name', 'artists', 'track_genre',
+            'popularity', 'danceability', 'energy', 'loudness',
+            'speechiness', 'acousticness', 'instrumentalness',
+            'liveness', 'valence', 'tempo'
+        ]
+
+        for col in required_columns:
+            if col not in df.columns:
+                raise ValueError(f"Missing required column: {col}")
+
+        # Convert numerical columns to appropriate types
+        numerical_columns = [
+            'popularity', 'danceability', 'energy', 'loudness',
+            'speechiness', 'acousticness', 'instrumentalness',
+            'liveness', 'valence', 'tempo'
+        ]
+
+        for col in numerical_columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+
+        # Drop any rows with invalid numerical values
+        df = df.dropna()
+
+        # Narrow the audio features to float32; they feed a float32 matrix
+        # anyway and the narrower dtype halves their memory footprint
+        audio_feature_columns = [col for col in numerical_columns if col != 'popularity']
+        df[audio_feature_columns] = df[audio_feature_columns].astype(np.float32)
+
+        # Cache the cleaned catalog for the next boot
+        try:
+            df.to_pickle(CATALOG_CACHE)
+        except OSError:
+            pass  # read-only filesystem (e.g. serverless); skip the cache
+
     recommender = MusicRecommender(df)
-    
+
 except Exception as e:
     print(f"Error loading data: {e}")
     
+# Optional Redis backing for liked-song state so swipes and recommendation
+# reads can hit different workers; falls back to the in-process dict
+REDIS_URL = os.getenv("REDIS_URL")
+if REDIS_URL:
+    import redis
+    redis_client = redis.Redis.from_url(REDIS_URL, decode_responses=True)
+else:
+    redis_client = None
+
+SESSION_TTL = 86400
+
 # Cache for storing user sessions
 user_sessions = {}
 
+# Short-TTL cache of session ids already validated against MongoDB, so the
+# swipe hot path doesn't pay a find_one round trip per swipe
+valid_session_cache = TTLCache(maxsize=100_000, ttl=3600)
+
+# Flush buffered swipe preferences to MongoDB every N swipes
+PREF_FLUSH_EVERY = 10
+
+
+def flush_pending_preferences(session_id):
+    """Flush buffered swipe preferences for a session to MongoDB in one write"""
+    session = user_sessions.get(session_id)
+    if not session or not session.get('pending_prefs'):
+        return
+
+    pending = session['pending_prefs']
+    session['pending_prefs'] = []
+
+    collection.update_one(
+        {"session_id": session_id},
+        {
+            "$push": {"preferences": {"$each": pending}},
+            "$set": {"last_updated": datetime.now()}
+        }
+    )
+
 
 @app.route('/api/genres', methods=['GET'])
 def get_genres():
@@ -328,8 +460,8 @@ def user_login():
         if not data.get('name'):
             return jsonify({'error': 'Name is required'}), 400
 
-        # Generate a proper session ID
-        session_id = str(uuid.uuid4())
+        # Generate a proper session ID (hex form is shorter and cheaper to hash)
+        session_id = uuid.uuid4().hex
         
         # Create user document in MongoDB
         user_data = {
@@ -344,12 +476,14 @@ def user_login():
         
         # Insert into MongoDB
         collection.insert_one(user_data)
+        valid_session_cache[session_id] = True
 
         # Create session in memory
         user_sessions[session_id] = {
             'name': data['name'],
             'genres': [],
-            'liked_songs': []
+            'liked_songs': [],
+            'pending_prefs': []
         }
 
         return jsonify({
@@ -399,7 +533,7 @@ def get_initial_songs():
             }
         )
         
-        return jsonify({
+        return ojsonify({
             'session_id': session_id,
             'songs': initial_songs,
             'total_songs': len(initial_songs)
@@ -420,10 +554,14 @@ def handle_swipe():
         if not session_id:
             return jsonify({'error': 'Session ID is required'}), 400
 
-        # Check if user exists in database
-        user = collection.find_one({"session_id": session_id})
-        if not user:
-            return jsonify({'error': 'Invalid session'}), 400
+        # Check if user exists in database (cached so rapid swiping doesn't
+        # pay a Mongo round trip per swipe)
+        user = None
+        if session_id not in valid_session_cache:
+            user = collection.find_one({"session_id": session_id})
+            if not user:
+                return jsonify({'error': 'Invalid session'}), 400
+            valid_session_cache[session_id] = True
 
         # Get song data
         song_data = recommender.get_song_data(song_index)
@@ -439,18 +577,24 @@ def handle_swipe():
             "swiped_at": datetime.now()
         }
 
-        # Update memory session
+        # Update memory session (recreate it if this worker hasn't seen the user)
+        session = user_sessions.setdefault(session_id, {
+            'name': (user or {}).get('name'),
+            'genres': (user or {}).get('genres', []),
+            'liked_songs': [],
+            'pending_prefs': []
+        })
         if liked and song_index is not None:
-            user_sessions[session_id]['liked_songs'].append(song_index)
+            if redis_client is not None:
+                redis_client.sadd(f"liked:{session_id}", song_index)
+                redis_client.expire(f"liked:{session_id}", SESSION_TTL)
+            else:
+                session['liked_songs'].append(song_index)
 
-        # Update MongoDB - add new preference and update timestamp
-        collection.update_one(
-            {"session_id": session_id},
-            {
-                "$push": {"preferences": preference},
-                "$set": {"last_updated": datetime.now()}
-            }
-        )
+        # Buffer the preference; flush to MongoDB every PREF_FLUSH_EVERY swipes
+        session.setdefault('pending_prefs', []).append(preference)
+        if len(session['pending_prefs']) >= PREF_FLUSH_EVERY:
+            flush_pending_preferences(session_id)
 
         return jsonify({
             'status': 'success',
@@ -475,7 +619,13 @@ def get_recommendations():
         if not user:
             return jsonify({'error': 'Invalid session'}), 400
 
-        liked_songs = user_sessions.get(session_id, {}).get('liked_songs', [])
+        # Flush any buffered swipes before finalizing the session
+        flush_pending_preferences(session_id)
+
+        if redis_client is not None:
+            liked_songs = list(redis_client.smembers(f"liked:{session_id}"))
+        else:
+            liked_songs = user_sessions.get(session_id, {}).get('liked_songs', [])
         recommendations = recommender.generate_recommendations(liked_songs)
 
         # Update MongoDB with recommendations and final timestamp
@@ -490,11 +640,13 @@ def get_recommendations():
             }
         )
         
-        # Clean up memory session
+        # Clean up session state
+        if redis_client is not None:
+            redis_client.delete(f"liked:{session_id}")
         if session_id in user_sessions:
             del user_sessions[session_id]
 
-        return jsonify({
+        return ojsonify({
             'status': 'success',
             'recommendations': recommendations
         })
@@ -502,6 +654,21 @@ def get_recommendations():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def _extract_thumbline(track_data):
+    """Extract the thumbnail payload the frontend needs from a Spotify track"""
+    return {
+        "name": track_data.get("name"),
+        "artists": ", ".join([artist["name"] for artist in track_data.get("artists", [])]),
+        "album": track_data.get("album", {}).get("name"),
+        "image": next(
+            (image["url"] for image in track_data.get("album", {}).get("images", [])
+             if image.get("height", 0) >= 300),  # Prefer larger images
+            track_data.get("album", {}).get("images", [{}])[0].get("url")  # Fallback to first image
+        ),
+        "preview_url": track_data.get("preview_url")
+    }
+
+
 @app.route("/get-song-detail", methods=["POST"])
 def get_song_detail():
     """Get song thumbnail from Spotify API"""
@@ -511,7 +678,13 @@ def get_song_detail():
         
         if not track_id:
             return jsonify({"error": "No track_id provided"}), 400
-        
+
+        # Serve from cache when possible
+        with track_detail_cache_lock:
+            cached = track_detail_cache.get(track_id)
+        if cached is not None:
+            return ojsonify(cached)
+
         # Get fresh token
         access_token = refresh_token_if_needed()
         if not access_token:
@@ -522,7 +695,7 @@ def get_song_detail():
             "Authorization": f"Bearer {access_token}"
         }
         
-        response = requests.get(
+        response = spotify_session.get(
             f"https://api.spotify.com/v1/tracks/{track_id}",
             headers=headers
         )
@@ -537,21 +710,14 @@ def get_song_detail():
         
         response.raise_for_status()
         track_data = response.json()
-        
+
         # Extract thumbnail data
-        thumbline = {
-            "name": track_data.get("name"),
-            "artists": ", ".join([artist["name"] for artist in track_data.get("artists", [])]),
-            "album": track_data.get("album", {}).get("name"),
-            "image": next(
-                (image["url"] for image in track_data.get("album", {}).get("images", [])
-                 if image.get("height", 0) >= 300),  # Prefer larger images
-                track_data.get("album", {}).get("images", [{}])[0].get("url")  # Fallback to first image
-            ),
-            "preview_url": track_data.get("preview_url")
-        }
-        
-        return jsonify(thumbline)
+        thumbline = _extract_thumbline(track_data)
+
+        with track_detail_cache_lock:
+            track_detail_cache[track_id] = thumbline
+
+        return ojsonify(thumbline)
     
     except requests.exceptions.RequestException as e:
         # Handle network or API errors
@@ -567,6 +733,89 @@ def get_song_detail():
         # Handle all other errors
         return jsonify({"error": f"Internal server error: {str(e)}"}), 500
 
-    
+@app.route("/api/song-details-batch", methods=["POST"])
+def get_song_details_batch():
+    """Get song details for many tracks at once via Spotify's multi-id endpoint"""
+    try:
+        data = request.get_json()
+        track_ids = data.get("track_ids", [])
+
+        if not track_ids:
+            return jsonify({"error": "No track_ids provided"}), 400
+
+        details = {}
+        missing = []
+
+        # Serve what we can from the cache
+        with track_detail_cache_lock:
+            for track_id in track_ids:
+                cached = track_detail_cache.get(track_id)
+                if cached is not None:
+                    details[track_id] = cached
+                else:
+                    missing.append(track_id)
+
+        if missing:
+            access_token = refresh_token_if_needed()
+            if not access_token:
+                return jsonify({"error": "Failed to get Spotify access token"}), 500
+
+            headers = {
+                "Authorization": f"Bearer {access_token}"
+            }
+
+            # Spotify's /v1/tracks accepts up to 50 ids per request
+            chunks = [missing[i:i+50] for i in range(0, len(missing), 50)]
+
+            def fetch_chunk(batch):
+                return spotify_session.get(
+                    "https://api.spotify.com/v1/tracks",
+                    params={"ids": ",".join(batch)},
+                    headers=headers
+                )
+
+            if len(chunks) == 1:
+                responses = [fetch_chunk(chunks[0])]
+            else:
+                # Overlap the round trips when more than one chunk is needed
+                with ThreadPoolExecutor(max_workers=min(8, len(chunks))) as executor:
+                    responses = list(executor.map(fetch_chunk, chunks))
+
+            for response in responses:
+                # Handle rate limiting
+                if response.status_code == 429:
+                    retry_after = int(response.headers.get('Retry-After', 1))
+                    return jsonify({
+                        "error": "Rate limited by Spotify",
+                        "retry_after": retry_after
+                    }), 429
+
+                response.raise_for_status()
+
+                for track_data in response.json().get("tracks", []):
+                    if not track_data:
+                        continue
+                    thumbline = _extract_thumbline(track_data)
+                    details[track_data["id"]] = thumbline
+                    with track_detail_cache_lock:
+                        track_detail_cache[track_data["id"]] = thumbline
+
+        return ojsonify(details)
+
+    except requests.exceptions.RequestException as e:
+        # Handle network or API errors
+        error_message = str(e)
+        if hasattr(e.response, 'json'):
+            try:
+                error_message = e.response.json().get('error', {}).get('message', str(e))
+            except:
+                pass
+        return jsonify({"error": f"Spotify API error: {error_message}"}), 502
+
+    except Exception as e:
+        # Handle all other errors
+        return jsonify({"error": f"Internal server error: {str(e)}"}), 500
+
+
 if __name__ == '__main__':
     app.run(debug=True,  host="0.0.0.0")
\ No newline at end of file
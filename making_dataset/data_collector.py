@@ -3,6 +3,7 @@ import pandas as pd
 from typing import List, Dict
 import time
 from requests.auth import HTTPBasicAuth
+from requests.adapters import HTTPAdapter
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import os
 import dotenv
@@ -16,14 +17,19 @@ class SpotifyDataCollector:
     def __init__(self, client_id: str, client_secret: str):
         self.client_id = client_id
         self.client_secret = client_secret
+        # Persistent session: keep-alive skips the per-call TCP/TLS handshake
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=32, pool_maxsize=64))
         self.token = self.get_token()
         self.genre_cache = {}  # Cache for storing artist genres
+        # One shared pool for artist lookups instead of a new executor per track
+        self.artist_executor = ThreadPoolExecutor(max_workers=16)
 
     def get_token(self) -> str:
         """Authenticate with Spotify API to get an access token."""
         auth_url = "https://accounts.spotify.com/api/token"
-        response = requests.post(auth_url, data={"grant_type": "client_credentials"},
-                                 auth=HTTPBasicAuth(self.client_id, self.client_secret))
+        response = self.session.post(auth_url, data={"grant_type": "client_credentials"},
+                                     auth=HTTPBasicAuth(self.client_id, self.client_secret))
         response_data = response.json()
         return response_data["access_token"]
 
@@ -39,76 +45,100 @@ class SpotifyDataCollector:
             return self.genre_cache[artist_id]
 
         artist_url = f"https://api.spotify.com/v1/artists/{artist_id}"
-        response = requests.get(artist_url, headers=self.get_headers())
+        response = self.session.get(artist_url, headers=self.get_headers())
+
+        # Respect Spotify's rate limiting before giving up on the artist
+        if response.status_code == 429:
+            time.sleep(int(response.headers.get("Retry-After", 1)))
+            response = self.session.get(artist_url, headers=self.get_headers())
+
         genres = response.json().get("genres", []) if response.status_code == 200 else []
-        
+
         self.genre_cache[artist_id] = genres  # Cache the fetched genres
         return genres
 
     def get_track_genres(self, track: Dict) -> str:
         """Aggregate genres from all artists in a track using concurrency and caching."""
+        artist_ids = [artist["id"] for artist in track["artists"]]
+
+        # Only the uncached artists need network calls; for the common
+        # cache-hit case this skips the executor entirely
+        missing = [artist_id for artist_id in artist_ids if artist_id not in self.genre_cache]
+        if missing:
+            list(self.artist_executor.map(self.fetch_artist_genre, missing))
+
         all_genres = set()
-        
-        with ThreadPoolExecutor() as executor:
-            futures = {executor.submit(self.fetch_artist_genre, artist["id"]): artist for artist in track["artists"]}
-            for future in as_completed(futures):
-                genres = future.result()
-                all_genres.update(genres)  # Use a set to keep genres unique
+        for artist_id in artist_ids:
+            all_genres.update(self.genre_cache.get(artist_id, []))
 
         return ", ".join(all_genres) if all_genres else "Unknown"  # Join unique genres or return 'Unknown'
 
+    def _fetch_batch(self, batch: List[str]) -> List[Dict]:
+        """Fetch track data and audio features for one batch of up to 50 IDs."""
+        tracks_url = f"https://api.spotify.com/v1/tracks?ids={','.join(batch)}"
+        features_url = f"https://api.spotify.com/v1/audio-features?ids={','.join(batch)}"
+
+        track_response = self.session.get(tracks_url, headers=self.get_headers())
+        features_response = self.session.get(features_url, headers=self.get_headers())
+
+        batch_data = []
+        if track_response.status_code == 200 and features_response.status_code == 200:
+            tracks = track_response.json()["tracks"]
+            features = features_response.json()["audio_features"]
+
+            for track, feature in zip(tracks, features):
+                if track and feature:
+                    track_data = {
+                        "track_id": track["id"],
+                        "artists": ", ".join([artist["name"] for artist in track["artists"]]),
+                        "album_name": track["album"]["name"],
+                        "track_name": track["name"],
+                        "popularity": track["popularity"],
+                        "duration_ms": track["duration_ms"],
+                        "explicit": track["explicit"],
+                        "danceability": feature["danceability"],
+                        "energy": feature["energy"],
+                        "key": feature["key"],
+                        "loudness": feature["loudness"],
+                        "mode": feature["mode"],
+                        "speechiness": feature["speechiness"],
+                        "acousticness": feature["acousticness"],
+                        "instrumentalness": feature["instrumentalness"],
+                        "liveness": feature["liveness"],
+                        "valence": feature["valence"],
+                        "tempo": feature["tempo"],
+                        "time_signature": feature["time_signature"],
+                        "track_genre": self.get_track_genres(track)
+                    }
+
+                    print(f"Processed track {track['name']}; Genre: {track_data['track_genre']}")
+                    batch_data.append(track_data)
+
+        return batch_data
+
     def get_track_data(self, track_ids: List[str]) -> pd.DataFrame:
         """Fetch track data and audio features for a list of track IDs."""
         global counter
         all_track_data = []
+        last_written = 0
+        intermediate_path = 'spotify_tracks_data_intermediate.csv'
 
-        for i in range(0, len(track_ids), 50):
-            batch = track_ids[i:i+50]
-            tracks_url = f"https://api.spotify.com/v1/tracks?ids={','.join(batch)}"
-            features_url = f"https://api.spotify.com/v1/audio-features?ids={','.join(batch)}"
-            
-            track_response = requests.get(tracks_url, headers=self.get_headers())
-            features_response = requests.get(features_url, headers=self.get_headers())
-
-            if track_response.status_code == 200 and features_response.status_code == 200:
-                tracks = track_response.json()["tracks"]
-                features = features_response.json()["audio_features"]
-
-                for track, feature in zip(tracks, features):
-                    if track and feature:
-                        track_data = {
-                            "track_id": track["id"],
-                            "artists": ", ".join([artist["name"] for artist in track["artists"]]),
-                            "album_name": track["album"]["name"],
-                            "track_name": track["name"],
-                            "popularity": track["popularity"],
-                            "duration_ms": track["duration_ms"],
-                            "explicit": track["explicit"],
-                            "danceability": feature["danceability"],
-                            "energy": feature["energy"],
-                            "key": feature["key"],
-                            "loudness": feature["loudness"],
-                            "mode": feature["mode"],
-                            "speechiness": feature["speechiness"],
-                            "acousticness": feature["acousticness"],
-                            "instrumentalness": feature["instrumentalness"],
-                            "liveness": feature["liveness"],
-                            "valence": feature["valence"],
-                            "tempo": feature["tempo"],
-                            "time_signature": feature["time_signature"],
-                            "track_genre": self.get_track_genres(track)
-                        }
-
-                        print(f"Processed track {track['name']}; Genre: {track_data['track_genre']}")
-                        all_track_data.append(track_data)
-                        counter += 1
-
-                        if counter % 50 == 0:
-                            # Save intermediate data
-                            print(f"Saving intermediate file with {counter} entries.")
-                            pd.DataFrame(all_track_data).to_csv(f'spotify_tracks_data_intermediate_{counter}.csv', index=False)
-
-            # time.sleep(1)  # Adjust as needed to avoid rate limits
+        batches = [track_ids[i:i+50] for i in range(0, len(track_ids), 50)]
+
+        # Overlap the per-batch round trips; accumulation stays in this thread
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            futures = [executor.submit(self._fetch_batch, batch) for batch in batches]
+            for future in as_completed(futures):
+                for track_data in future.result():
+                    all_track_data.append(track_data)
+                    counter += 1
+
+                    if counter % 50 == 0:
+                        # Append only the rows accumulated since the last save
+                        print(f"Saving intermediate file with {counter} entries.")
+                        pd.DataFrame(all_track_data[last_written:]).to_csv(
+                            intermediate_path, mode='a', header=(last_written == 0), index=False)
+                        last_written = len(all_track_data)
 
         return pd.DataFrame(all_track_data)
 
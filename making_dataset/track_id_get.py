@@ -2,6 +2,7 @@ import spotipy
 from spotipy.oauth2 import SpotifyClientCredentials
 import pandas as pd
 from typing import List
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import os
 import dotenv
 
@@ -41,13 +42,17 @@ def main():
     # Example playlist ID (replace with your playlist ID)
     PLAYLIST_IDS = ["0i2S0eEdftTrmLKueMWUKX", "37i9dQZF1DX0XUfTFmNBRM","2U5naKBJ5DN3oOPbuRiTem", "37i9dQZEVXbLZ52XmnySJg","4nNVfQ9eWidZXkBKZN5li4","4y2MWq5CaEtCIiU5vngwIl","37i9dQZF1DWXtlo6ENS92N","7sTkp2X5Aq84v9w9UtfkaF","37i9dQZF1DWZNJXX2UeBij", "37i9dQZF1DWYRTlrhMB12D", "4vBo2bq0dohHJSswn5pNGC", "6an0hNyshVMWORG7qVNUbq", "5gSVvj8ukLSQlSnClSp1sR", "5ac6PsFtcjz6feEUD7Hqff", "6Y5PXLpvP5sY2hRcIQJoMP", "72Ehl5vaajx3jB7IiY2dun", "7rkHa0nMODlV8YSxgptPB6", "3zGW3iZLZYWa8d3DOxRplp"]
     
-    # Extract track IDs from playlist
+    # Extract track IDs from all playlists concurrently; each playlist is
+    # dominated by Spotify round trips, so overlap them
     track_ids = set()
-    for playlist_id in PLAYLIST_IDS:
-        try:
-            track_ids.update(extractor.get_playlist_tracks(playlist_id))
-        except:
-            print(f"Failed to extract tracks from playlist {playlist_id}")
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        futures = {executor.submit(extractor.get_playlist_tracks, playlist_id): playlist_id
+                   for playlist_id in PLAYLIST_IDS}
+        for future in as_completed(futures):
+            try:
+                track_ids.update(future.result())
+            except:
+                print(f"Failed to extract tracks from playlist {futures[future]}")
 
     # Save track IDs to CSV
     df = pd.DataFrame(track_ids, columns=["track_id"])